@@ -1,9 +1,10 @@
 # backend/main.py
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from .db import SessionLocal, engine
-from . import models, schemas, init_db
+from . import models, schemas, init_db, profiling, etag
 from rapidfuzz import process, fuzz
 from typing import List
 import math
@@ -21,6 +22,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# compress large payloads (history lists, catalog analytics)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# sampled profiling (off until enabled via POST /admin/profile/config)
+app.add_middleware(profiling.ProfileMiddleware)
+app.include_router(profiling.router)
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
@@ -54,6 +62,7 @@ def login_user(payload: schemas.LoginIn, db: Session = Depends(get_db)):
 # Search endpoint (fuzzy matching + risk scoring + recommendations)
 # -----------------
 @app.post("/search")
+@profiling.profiled
 def search(payload: schemas.SearchIn, db: Session = Depends(get_db)):
     # Normalize symptoms
     input_symptoms = [s.strip().lower() for s in payload.input_symptoms.split(",") if s.strip()]
@@ -141,6 +150,7 @@ def search(payload: schemas.SearchIn, db: Session = Depends(get_db)):
         )
         db.add(hist)
         db.commit()
+        etag.bump(f"history:{payload.user_email or ''}")
 
     # Return JSON with recommendations and CF suggestions
     return {
@@ -159,13 +169,24 @@ def purchase(payload: schemas.PurchaseIn, db: Session = Depends(get_db)):
     p = models.Purchase(user_email=payload.user_email, condition=payload.condition, medicine=payload.medicine)
     db.add(p)
     db.commit()
+    etag.bump("purchases")
     return {"ok": True}
 
 # -----------------
 # History and purchases queries
 # -----------------
-@app.get("/history/{user_email}")
-def get_history(user_email: str, db: Session = Depends(get_db)):
+@app.get("/history/{user_email}", response_model=List[schemas.HistoryOut])
+def get_history(user_email: str, request: Request, response: Response, db: Session = Depends(get_db)):
+    tag = etag.make_etag(f"history:{user_email}")
+    cached = etag.not_modified(request, tag)
+    if cached:
+        return cached
+    response.headers["ETag"] = tag
+    return load_history(db, user_email)
+
+# profiled separately so 304 replies above never end up in the samples
+@profiling.profiled
+def load_history(db: Session, user_email: str):
     rows = db.query(models.History).filter(models.History.user_email == user_email).order_by(models.History.timestamp.desc()).all()
     out = []
     for r in rows:
@@ -182,8 +203,13 @@ def get_history(user_email: str, db: Session = Depends(get_db)):
         })
     return out
 
-@app.get("/frequent_purchases")
-def frequent_purchases(db: Session = Depends(get_db)):
+@app.get("/frequent_purchases", response_model=List[schemas.FrequentPurchaseOut])
+def frequent_purchases(request: Request, response: Response, db: Session = Depends(get_db)):
+    tag = etag.make_etag("purchases")
+    cached = etag.not_modified(request, tag)
+    if cached:
+        return cached
+    response.headers["ETag"] = tag
     # Return most frequent medicine per condition
     sql = """
     SELECT condition, medicine, COUNT(*) as freq
@@ -0,0 +1,38 @@
+# backend/etag.py
+# Data generation counters used to answer conditional GETs without touching the DB.
+# Counters live in process memory, so the backend must be served by a single
+# process (see Procfile: --workers 1). With several workers a write on one
+# would not bump the others' counters and they would answer 304 with stale data.
+# The boot id keeps ETags from a previous process (whose counters restarted
+# at 0) from ever matching.
+import hashlib
+import threading
+import uuid
+
+from fastapi import Request, Response
+
+_boot_id = uuid.uuid4().hex[:8]
+_lock = threading.Lock()
+_versions = {}  # e.g. "purchases" or "history:<email>" -> int
+
+
+def bump(key: str):
+    with _lock:
+        _versions[key] = _versions.get(key, 0) + 1
+
+
+def make_etag(key: str) -> str:
+    # read the version before the query runs: a write racing the query only
+    # makes the ETag look older than the data, which costs one extra refetch
+    with _lock:
+        version = _versions.get(key, 0)
+    key_hash = hashlib.sha1(key.encode()).hexdigest()[:8]
+    return f'W/"{_boot_id}-{key_hash}-{version}"'
+
+
+def not_modified(request: Request, etag: str):
+    """Return a 304 response when the client already holds `etag`, else None."""
+    client_tags = request.headers.get("if-none-match", "")
+    if etag in [t.strip() for t in client_tags.split(",")] or client_tags.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
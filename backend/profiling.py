@@ -0,0 +1,267 @@
+# backend/profiling.py
+# On-demand profiling for live workers: sampled cProfile runs, collapsed stacks
+# for flamegraphs and tracemalloc allocation sites. Everything is off by default
+# and can be switched at runtime through the /admin/profile endpoints.
+import cProfile
+import contextvars
+import functools
+import hmac
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from typing import Optional
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_HEADER = b"x-admin-token"
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+logger = logging.getLogger(__name__)
+
+# runtime settings (changed through POST /admin/profile/config)
+settings = {
+    "enabled": False,
+    "sample_every": 100,  # profile 1 in N calls of a @profiled endpoint
+    "allow_header": True,  # X-Profile: 1 plus a valid X-Admin-Token forces a capture
+    "tracemalloc": False,
+    "sample_interval_ms": 5,
+    "top_n": 25,
+}
+
+_lock = threading.Lock()
+_capture_lock = threading.Lock()  # one capture at a time; cProfile can't nest on 3.12+
+_stacks = Counter()  # "frame;frame;frame" -> samples
+_stats = {}  # endpoint name -> pstats.Stats
+_allocations = {}  # endpoint name -> list of top allocation sites
+_calls_seen = 0
+
+# snapshot diffs exclude the profiler's own bookkeeping (including the sampler thread)
+_ALLOCATION_FILTERS = [
+    tracemalloc.Filter(False, "*cProfile.py"),
+    tracemalloc.Filter(False, "*pstats.py"),
+    tracemalloc.Filter(False, "*tracemalloc.py"),
+    tracemalloc.Filter(False, "*threading.py"),
+    tracemalloc.Filter(False, __file__),
+]
+
+# set by the middleware, read by @profiled inside the worker thread
+_forced = contextvars.ContextVar("profile_forced", default=False)
+
+
+def _is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and hmac.compare_digest((token or "").encode(), ADMIN_TOKEN.encode())
+
+
+def _should_sample() -> bool:
+    global _calls_seen
+    if not settings["enabled"]:
+        return False
+    if _forced.get():
+        return True
+    with _lock:
+        _calls_seen += 1
+        return _calls_seen % settings["sample_every"] == 0
+
+
+class ProfileMiddleware:
+    """Plain ASGI middleware marking requests that force a capture with X-Profile: 1.
+
+    It only looks at the headers while profiling is enabled; otherwise the
+    request is passed straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (settings["enabled"] and settings["allow_header"]):
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        if headers.get(PROFILE_HEADER) != b"1" or not _is_admin(headers.get(ADMIN_HEADER, b"").decode("latin-1")):
+            return await self.app(scope, receive, send)
+        token = _forced.set(True)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _forced.reset(token)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class _StackSampler(threading.Thread):
+    """Periodically records the call stack of one thread as a collapsed string."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_label(frame))
+                frame = frame.f_back
+            if names:
+                self.samples[";".join(reversed(names))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _take_snapshot():
+    # tracing can be switched off from /admin/profile/config mid-capture
+    if not tracemalloc.is_tracing():
+        return None
+    return tracemalloc.take_snapshot().filter_traces(_ALLOCATION_FILTERS)
+
+
+def _record(name, profiler, sampler, before, after):
+    stats = pstats.Stats(profiler)
+    with _lock:
+        _stacks.update(sampler.samples)
+        if name in _stats:
+            _stats[name].add(stats)
+        else:
+            _stats[name] = stats
+        if before is not None and after is not None:
+            diff = after.compare_to(before, "lineno")[: settings["top_n"]]
+            _allocations[name] = [
+                {
+                    "site": str(d.traceback[0]),
+                    "size_diff_kb": round(d.size_diff / 1024, 2),
+                    "count_diff": d.count_diff,
+                }
+                for d in diff
+            ]
+
+
+def profiled(func):
+    """Profile sampled calls of a sync endpoint or helper; other calls run untouched."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _should_sample() or not _capture_lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        try:
+            # profiling must never fail the request: any error here means an unprofiled call
+            sampler = None
+            try:
+                before = None
+                if settings["tracemalloc"]:
+                    if not tracemalloc.is_tracing():
+                        tracemalloc.start()
+                    before = _take_snapshot()
+                sampler = _StackSampler(threading.get_ident(), settings["sample_interval_ms"] / 1000.0)
+                profiler = cProfile.Profile()
+                sampler.start()
+                profiler.enable()
+            except Exception:
+                logger.exception("could not start profiling %s", func.__name__)
+                if sampler is not None and sampler.is_alive():
+                    sampler.stop()
+                return func(*args, **kwargs)
+            after = None
+            try:
+                return func(*args, **kwargs)
+            finally:
+                try:
+                    profiler.disable()
+                    sampler.stop()
+                    if before is not None:
+                        after = _take_snapshot()
+                    _record(func.__name__, profiler, sampler, before, after)
+                except Exception:
+                    logger.exception("could not record profile for %s", func.__name__)
+        finally:
+            _capture_lock.release()
+
+    return wrapper
+
+
+# -----------------
+# Admin endpoints
+# -----------------
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not _is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin access required")
+
+
+class ProfileConfigIn(BaseModel):
+    enabled: Optional[bool] = None
+    sample_every: Optional[int] = Field(default=None, ge=1)
+    allow_header: Optional[bool] = None
+    tracemalloc: Optional[bool] = None
+    sample_interval_ms: Optional[int] = Field(default=None, ge=1)
+    top_n: Optional[int] = Field(default=None, ge=1)
+
+
+router = APIRouter(prefix="/admin/profile", dependencies=[Depends(require_admin)])
+
+
+@router.get("", response_class=PlainTextResponse)
+def get_profile():
+    # collapsed stacks, one "frame;frame;frame count" per line (flamegraph.pl / speedscope)
+    with _lock:
+        lines = [f"{stack} {count}" for stack, count in _stacks.most_common()]
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+@router.get("/stats", response_class=PlainTextResponse)
+def get_profile_stats():
+    out = io.StringIO()
+    with _lock:
+        for name, stats in _stats.items():
+            out.write(f"===== {name} =====\n")
+            stats.stream = out
+            stats.sort_stats("cumulative").print_stats(settings["top_n"])
+    return out.getvalue()
+
+
+@router.get("/memory")
+def get_profile_memory():
+    with _lock:
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            # snapshots are process-wide: concurrent requests on other threads show up too
+            "scope": "process-wide snapshot diff around each sampled call",
+            "endpoints": dict(_allocations),
+        }
+
+
+@router.get("/config")
+def get_profile_config():
+    return dict(settings, calls_seen=_calls_seen)
+
+
+@router.post("/config")
+def set_profile_config(payload: ProfileConfigIn):
+    changes = payload.model_dump(exclude_none=True)
+    settings.update(changes)
+    if changes.get("tracemalloc") is False and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return dict(settings)
+
+
+@router.delete("")
+def reset_profile():
+    with _lock:
+        _stacks.clear()
+        _stats.clear()
+        _allocations.clear()
+    return {"ok": True}
@@ -26,3 +26,19 @@ class Recommendation(BaseModel):
     condition: str
     recommended_medicines: List[str]
     precautions: Optional[str]
+
+class HistoryOut(BaseModel):
+    id: int
+    user_email: Optional[str]
+    input_symptoms: Optional[str]
+    severity: Optional[str]
+    duration_days: Optional[int]
+    risk_score: Optional[float]
+    conditions_found: Optional[str]
+    recommended_medicine: Optional[str]
+    timestamp: str  # ISO 8601
+
+class FrequentPurchaseOut(BaseModel):
+    condition: Optional[str]
+    medicine: Optional[str]
+    freq: int
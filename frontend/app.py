@@ -45,6 +45,26 @@ if "user_email" not in st.session_state:
     st.session_state.user_email = ""
 if "username" not in st.session_state:
     st.session_state.username = ""
+if "etag_cache" not in st.session_state:
+    st.session_state.etag_cache = {}  # url -> (etag, json)
+
+# -----------------------------
+# Conditional GET helper: reruns reuse the cached body when the backend answers 304
+# -----------------------------
+def get_json_cached(url, timeout=8):
+    cache = st.session_state.etag_cache
+    headers = {}
+    if url in cache:
+        headers["If-None-Match"] = cache[url][0]
+    r = requests.get(url, headers=headers, timeout=timeout)
+    if r.status_code == 304 and url in cache:
+        return 200, cache[url][1]
+    if r.status_code == 200:
+        data = r.json()
+        if r.headers.get("ETag"):
+            cache[url] = (r.headers["ETag"], data)
+        return 200, data
+    return r.status_code, None
 
 # -----------------------------
 # Login / Signup helper functions
@@ -266,9 +286,8 @@ with tab1:
 with tab2:
     st.subheader("🗂 Personal Health Record")
     try:
-        r = requests.get(f"{BACKEND}/history/{st.session_state.user_email}", timeout=8)
-        if r.status_code == 200:
-            df_hist_json = r.json()
+        hist_status, df_hist_json = get_json_cached(f"{BACKEND}/history/{st.session_state.user_email}", timeout=8)
+        if hist_status == 200:
             if df_hist_json:
                 df_hist = pd.DataFrame(df_hist_json)
                 st.dataframe(df_hist)
@@ -300,9 +319,9 @@ with tab2:
 
                 # Frequent purchases
                 st.markdown("### 📦 Medicine Purchase Trends by other users")
-                r2 = requests.get(f"{BACKEND}/frequent_purchases", timeout=8)
-                if r2.status_code == 200:
-                    top_purchases = pd.DataFrame(r2.json())
+                fp_status, fp_json = get_json_cached(f"{BACKEND}/frequent_purchases", timeout=8)
+                if fp_status == 200:
+                    top_purchases = pd.DataFrame(fp_json)
                     if not top_purchases.empty:
                         st.table(top_purchases)
                     else: